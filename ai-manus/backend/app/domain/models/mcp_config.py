@@ -27,6 +27,9 @@ class MCPServerConfig(BaseModel):
     enabled: bool = Field(default=True)
     description: Optional[str] = None
     env: Optional[Dict[str, str]] = None
+    timeout: Optional[float] = None  # Connection timeout in seconds
+    lazy: bool = Field(default=False)  # Defer connection until a tool is first called
+    tools: Optional[List[Dict[str, Any]]] = None  # Tool manifest advertised by lazy servers
     
     @field_validator("url")
     def validate_url_for_http_transport(cls, v: Optional[str], values) -> Optional[str]:
@@ -1,13 +1,26 @@
+import io
 import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set, Tuple
+from itertools import chain
+from collections import defaultdict
 from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import anyio
 
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 from mcp.client.sse import sse_client
 from mcp.client.streamable_http import streamablehttp_client
-from mcp.types import Tool as MCPTool
+from mcp.types import Tool as MCPToolDefinition, Implementation
 
 from app.domain.services.tools.base import BaseTool, tool
 from app.domain.models.tool_result import ToolResult
@@ -15,16 +28,105 @@ from app.domain.models.mcp_config import MCPConfig, MCPServerConfig
 
 logger = logging.getLogger(__name__)
 
+# Default seconds allowed for a single server to connect and initialize
+DEFAULT_CONNECT_TIMEOUT = 30
+
+# Idle seconds after which a session is pinged before reuse
+KEEPALIVE_INTERVAL = 60
+
+# Seconds a live session has to answer a keepalive ping
+PING_TIMEOUT = 5
+
+# Seconds to wait before retrying a server that failed to connect, doubling per
+# consecutive failure up to the cooldown
+RECONNECT_BACKOFF = 1
+RECONNECT_COOLDOWN = 30
+
+# Errors raised when the underlying transport of a session has died
+TRANSPORT_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream)
+
+# On-disk cache of server tool lists, one file per launch config holding the
+# tools of the server version last seen with it
+TOOLS_CACHE_DIR = Path.home() / ".cache" / "aicodingweb" / "mcp_tools"
+
+
+# Resolved stdio server commands by command and PATH
+_resolved_commands: Dict[Tuple[str, Optional[str]], str] = {}
+
+
+def _resolve_command(command: str, path: Optional[str]) -> str:
+    """Resolve a stdio server command against PATH, searching again only if the cached binary is gone"""
+    key = (command, path)
+    resolved = _resolved_commands.get(key)
+    if resolved is None or not os.path.exists(resolved):
+        resolved = shutil.which(command, path=path)
+        if resolved is None:
+            _resolved_commands.pop(key, None)
+            return command
+        _resolved_commands[key] = resolved
+    return resolved
+
+
+def _dump_tools(tools: List[MCPToolDefinition]) -> List[Dict[str, Any]]:
+    """Serialize tool definitions in the on-disk cache format"""
+    return [tool.model_dump(mode="json", exclude_none=True) for tool in tools]
+
+
+def _read_tools_cache(path: Path, server_info: Implementation) -> Optional[List[MCPToolDefinition]]:
+    """Read a cached tool list, returning None on cache miss or a different server version"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            cache = json.load(f)
+    except FileNotFoundError:
+        return None
+
+    if cache["server"] != [server_info.name, server_info.version]:
+        return None
+    return [MCPToolDefinition.model_validate(tool) for tool in cache["tools"]]
+
+
+def _write_tools_cache(path: Path, server_info: Implementation, tools: List[MCPToolDefinition]):
+    """Atomically write a tool list to the cache, replacing that of any older server version"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    f = tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=path.parent, suffix=".tmp", delete=False
+    )
+    try:
+        with f:
+            json.dump({
+                "server": [server_info.name, server_info.version],
+                "tools": _dump_tools(tools),
+            }, f)
+        os.replace(f.name, path)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+
+
+@dataclass(slots=True)
+class _ManagedSession:
+    """Connected MCP session with liveness bookkeeping"""
+    session: ClientSession
+    last_used: float = field(default_factory=time.monotonic)
+
 
 class MCPClientManager:
     """MCP Client Manager"""
     
     def __init__(self, config: Optional[MCPConfig] = None):
-        self._clients: Dict[str, ClientSession] = {}
-        self._exit_stack = AsyncExitStack()
-        self._tools_cache: Dict[str, List[MCPTool]] = {}
+        self._clients: Dict[str, _ManagedSession] = {}
+        self._server_tasks: Dict[str, Tuple[asyncio.Task, asyncio.Event]] = {}
+        self._connect_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._retry_after: Dict[str, float] = {}
+        self._connect_failures: Dict[str, int] = {}
+        self._tools_cache: Dict[str, List[Dict[str, Any]]] = {}
+        self._server_prefixes: Dict[str, str] = {}
+        self._tool_index: Dict[str, Tuple[str, str]] = {}
+        self._all_tools_cache: Optional[List[Dict[str, Any]]] = None
+        self._revalidate_tasks: Set[asyncio.Task] = set()
         self._initialized = False
         self._config = config
+        self._base_env = os.environ.copy()
     
     async def initialize(self):
         """Initialize MCP client manager"""
@@ -34,6 +136,12 @@ class MCPClientManager:
         try:
             logger.info(f"Loaded {len(self._config.mcpServers)} MCP server configurations from config")
 
+            # Tool name prefix per server, avoiding duplicate mcp_ prefix
+            self._server_prefixes = {
+                server_name: server_name if server_name.startswith('mcp_') else f"mcp_{server_name}"
+                for server_name in self._config.mcpServers
+            }
+
             # Connect to all enabled servers
             await self._connect_servers()
 
@@ -46,73 +154,226 @@ class MCPClientManager:
 
     
     async def _connect_servers(self):
-        """Connect to all enabled MCP servers"""
+        """Connect to all enabled MCP servers concurrently"""
+        tasks = []
         for server_name, server_config in self._config.mcpServers.items():
             if not server_config.enabled:
                 continue
+            if server_config.lazy:
+                if server_config.tools is not None:
+                    self._cache_manifest_tools(server_name, server_config)
+                    continue
+                logger.warning(f"Lazy MCP server {server_name} declares no tool manifest, connecting eagerly")
+            tasks.append(asyncio.create_task(self._connect_isolated(server_name, server_config)))
 
-            try:
-                await self._connect_server(server_name, server_config)
-            except Exception as e:
-                logger.error(f"Failed to connect to MCP server {server_name}: {e}")
-                # Continue connecting to other servers
-                continue
+        try:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        except asyncio.CancelledError:
+            # Let every partially constructed connection unwind before propagating
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _connect_isolated(self, server_name: str, server_config: MCPServerConfig):
+        """Connect to a single MCP server without letting its failure reach peer tasks"""
+        try:
+            await self._connect_server(server_name, server_config)
+        except Exception as e:
+            # Failed servers are logged and skipped, the others stay connected
+            logger.error(f"Failed to connect to MCP server {server_name}: {e!r}")
     
     async def _connect_server(self, server_name: str, server_config: MCPServerConfig):
-        """Connect to a single MCP server"""
+        """Connect to a single MCP server
+
+        The connection lives in a dedicated task, since anyio-based transports
+        must be closed by the same task that opened them.
+        """
+        ready = asyncio.get_running_loop().create_future()
+        shutdown = asyncio.Event()
+        task = asyncio.create_task(self._serve_server(server_name, server_config, ready, shutdown))
         try:
-            transport_type = server_config.transport
-
-            if transport_type == 'stdio':
-                await self._connect_stdio_server(server_name, server_config)
-            elif transport_type == 'http' or transport_type == 'sse':
-                await self._connect_http_server(server_name, server_config)
-            elif transport_type == 'streamable-http':
-                await self._connect_streamable_http_server(server_name, server_config)
-            else:
-                logger.error(f"Unsupported transport type: {transport_type}")
+            connected = await ready
+        except asyncio.CancelledError:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            raise
 
-        except Exception as e:
-            logger.error(f"Failed to connect to MCP server {server_name}: {e}")
+        if connected:
+            self._server_tasks[server_name] = (task, shutdown)
+
+    async def _serve_server(
+        self,
+        server_name: str,
+        server_config: MCPServerConfig,
+        ready: asyncio.Future,
+        shutdown: asyncio.Event
+    ):
+        """Open a server connection, hold it until shutdown, then close it in this task"""
+        timeout = server_config.timeout or DEFAULT_CONNECT_TIMEOUT
+        error = None
+        try:
+            # Each server owns its exit stack, so concurrent connections never share one
+            async with AsyncExitStack() as stack:
+                try:
+                    transport_type = server_config.transport
+
+                    if transport_type == 'stdio':
+                        connect = self._connect_stdio_server(server_name, server_config, stack)
+                    elif transport_type == 'http' or transport_type == 'sse':
+                        connect = self._connect_http_server(server_name, server_config, stack)
+                    elif transport_type == 'streamable-http':
+                        connect = self._connect_streamable_http_server(server_name, server_config, stack)
+                    else:
+                        logger.error(f"Unsupported transport type: {transport_type}")
+                        ready.set_result(False)
+                        return
+
+                    # asyncio.timeout keeps the connect in this task, unlike wait_for on Python < 3.12
+                    async with asyncio.timeout(timeout):
+                        await connect
+
+                except TimeoutError:
+                    self._clients.pop(server_name, None)
+                    error = TimeoutError(f"Timed out connecting to MCP server {server_name} after {timeout}s")
+                except Exception as e:
+                    self._clients.pop(server_name, None)
+                    error = e
+                else:
+                    ready.set_result(True)
+                    await shutdown.wait()
+
+            # Report failures only once the half-started transport (e.g. a
+            # stalled stdio subprocess) has been reaped by the exit stack
+            if error:
+                ready.set_exception(error)
+
+        except asyncio.CancelledError:
+            if not ready.done():
+                ready.cancel()
+            raise
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e)
             raise
+
+    async def _disconnect_server(self, server_name: str):
+        """Close a single MCP server connection without touching its peers"""
+        self._clients.pop(server_name, None)
+        server_task = self._server_tasks.pop(server_name, None)
+        if server_task:
+            task, shutdown = server_task
+            shutdown.set()
+            await task
     
-    async def _connect_stdio_server(self, server_name: str, server_config: MCPServerConfig):
+    async def _ensure_connected(self, server_name: str) -> Optional[_ManagedSession]:
+        """Get a live session of a server
+
+        Lazy servers are connected on first use, servers that are down are
+        reconnected once their cooldown has passed, and sessions idle for
+        longer than the keepalive interval are pinged and reconnected if dead.
+        """
+        server_config = self._config.mcpServers[server_name]
+        managed = self._clients.get(server_name)
+        if managed:
+            if time.monotonic() - managed.last_used <= KEEPALIVE_INTERVAL:
+                return managed
+            try:
+                await asyncio.wait_for(managed.session.send_ping(), timeout=PING_TIMEOUT)
+                managed.last_used = time.monotonic()
+                return managed
+            except Exception as e:
+                logger.warning(f"MCP server {server_name} failed keepalive ping: {e!r}")
+                return await self._reconnect(server_name, managed)
+
+        if not server_config.enabled:
+            return None
+
+        async with self._connect_locks[server_name]:
+            # Another caller may have connected while we waited for the lock
+            if server_name not in self._clients:
+                if time.monotonic() < self._retry_after.get(server_name, 0):
+                    return None
+                logger.info(f"Connecting MCP server on demand: {server_name}")
+                try:
+                    await self._connect_server(server_name, server_config)
+                finally:
+                    self._note_connect_result(server_name)
+        return self._clients.get(server_name)
+
+    def _note_connect_result(self, server_name: str):
+        """Back off retries of a server that is still not connected"""
+        if server_name in self._clients:
+            self._retry_after.pop(server_name, None)
+            self._connect_failures.pop(server_name, None)
+        else:
+            failures = self._connect_failures.get(server_name, 0) + 1
+            self._connect_failures[server_name] = failures
+            delay = min(RECONNECT_BACKOFF * 2 ** (failures - 1), RECONNECT_COOLDOWN)
+            self._retry_after[server_name] = time.monotonic() + delay
+
+    async def _reconnect(self, server_name: str, stale: _ManagedSession) -> Optional[_ManagedSession]:
+        """Recycle a single server connection
+
+        Only one attempt is made per call so the connect lock is never held
+        across a backoff; if it fails, later calls retry through
+        _ensure_connected once the growing cooldown has passed.
+        """
+        server_config = self._config.mcpServers[server_name]
+
+        async with self._connect_locks[server_name]:
+            # Another caller may have reconnected while we waited for the lock
+            current = self._clients.get(server_name)
+            if current is not None and current is not stale:
+                return current
+
+            try:
+                await self._disconnect_server(server_name)
+            except Exception as e:
+                logger.warning(f"Failed to close dead MCP server {server_name}: {e!r}")
+
+            if time.monotonic() < self._retry_after.get(server_name, 0):
+                return None
+            try:
+                logger.info(f"Reconnecting MCP server {server_name}")
+                await self._connect_server(server_name, server_config)
+            except Exception as e:
+                logger.warning(f"Failed to reconnect MCP server {server_name}: {e!r}")
+            finally:
+                self._note_connect_result(server_name)
+
+        return self._clients.get(server_name)
+
+    async def _connect_stdio_server(self, server_name: str, server_config: MCPServerConfig, stack: AsyncExitStack):
         """Connect to stdio MCP server"""
         command = server_config.command
         args = server_config.args or []
-        env = server_config.env or {}
+        env = server_config.env
 
         if not command:
             raise ValueError(f"Server {server_name} is missing command configuration")
 
-
         # Create server parameters (path handling already done in config provider)
+        server_env = self._base_env | env if env else self._base_env
         server_params = StdioServerParameters(
-            command=command,
+            command=_resolve_command(command, server_env.get("PATH")),
             args=args,
-            env={**os.environ, **env}
+            env=server_env
         )
 
         try:
             # Establish connection
-            stdio_transport = await self._exit_stack.enter_async_context(
+            stdio_transport = await stack.enter_async_context(
                 stdio_client(server_params)
             )
             read_stream, write_stream = stdio_transport
 
             # Create session
-            session = await self._exit_stack.enter_async_context(
+            session = await stack.enter_async_context(
                 ClientSession(read_stream, write_stream)
             )
 
-            # Initialize session
-            await session.initialize()
-
-            # Cache client
-            self._clients[server_name] = session
-
-            # Get and cache tool list
-            await self._cache_server_tools(server_name, session)
+            await self._finalize_session(server_name, session)
 
             logger.info(f"Successfully connected to stdio MCP server: {server_name}")
 
@@ -120,7 +381,7 @@ class MCPClientManager:
             logger.error(f"Failed to connect to stdio MCP server {server_name}: {e}")
             raise
     
-    async def _connect_http_server(self, server_name: str, server_config: MCPServerConfig):
+    async def _connect_http_server(self, server_name: str, server_config: MCPServerConfig, stack: AsyncExitStack):
         """Connect to HTTP MCP server"""
         url = server_config.url
         if not url:
@@ -128,24 +389,17 @@ class MCPClientManager:
 
         try:
             # Establish SSE connection
-            sse_transport = await self._exit_stack.enter_async_context(
+            sse_transport = await stack.enter_async_context(
                 sse_client(url)
             )
             read_stream, write_stream = sse_transport
 
             # Create session
-            session = await self._exit_stack.enter_async_context(
+            session = await stack.enter_async_context(
                 ClientSession(read_stream, write_stream)
             )
 
-            # Initialize session
-            await session.initialize()
-
-            # Cache client
-            self._clients[server_name] = session
-
-            # Get and cache tool list
-            await self._cache_server_tools(server_name, session)
+            await self._finalize_session(server_name, session)
 
             logger.info(f"Successfully connected to HTTP MCP server: {server_name}")
 
@@ -153,7 +407,7 @@ class MCPClientManager:
             logger.error(f"Failed to connect to HTTP MCP server {server_name}: {e}")
             raise
     
-    async def _connect_streamable_http_server(self, server_name: str, server_config: MCPServerConfig):
+    async def _connect_streamable_http_server(self, server_name: str, server_config: MCPServerConfig, stack: AsyncExitStack):
         """Connect to streamable-http MCP server
 
         Configuration options:
@@ -176,7 +430,7 @@ class MCPClientManager:
                 client_params["headers"] = headers
 
             # Establish streamable-http connection
-            streamable_transport = await self._exit_stack.enter_async_context(
+            streamable_transport = await stack.enter_async_context(
                 streamablehttp_client(**client_params)
             )
 
@@ -187,18 +441,11 @@ class MCPClientManager:
                 read_stream, write_stream = streamable_transport
 
             # Create MCP session
-            session = await self._exit_stack.enter_async_context(
+            session = await stack.enter_async_context(
                 ClientSession(read_stream, write_stream)
             )
 
-            # Initialize session
-            await session.initialize()
-
-            # Cache client
-            self._clients[server_name] = session
-
-            # Get and cache tool list
-            await self._cache_server_tools(server_name, session)
+            await self._finalize_session(server_name, session)
 
             logger.info(f"Successfully connected to streamable-http MCP server: {server_name} ({url})")
 
@@ -206,85 +453,213 @@ class MCPClientManager:
             logger.error(f"Failed to connect to streamable-http MCP server {server_name}: {e}")
             raise
     
-    async def _cache_server_tools(self, server_name: str, session: ClientSession):
-        """Cache server tool list"""
+    async def _finalize_session(self, server_name: str, session: ClientSession):
+        """Initialize session, then register client and cache its tools
+
+        The MCP handshake must complete before any other request is sent, so
+        initialize and list_tools stay ordered within a server; overlap comes
+        from connecting servers concurrently.
+        """
+        init_result = await session.initialize()
+        self._clients[server_name] = _ManagedSession(session)
+        await self._cache_server_tools(server_name, session, getattr(init_result, 'serverInfo', None))
+
+    def _tools_cache_path(self, server_name: str, server_info: Optional[Implementation]) -> Optional[Path]:
+        """Get the on-disk tool list cache path, or None if the server reports no version
+
+        The path depends on the launch config only, so a new server version
+        overwrites the cache of the old one instead of leaving it behind.
+        """
+        if not server_info or not server_info.version:
+            return None
+
+        server_config = self._config.mcpServers[server_name]
+        key = json.dumps([
+            server_config.transport,
+            server_config.command,
+            server_config.args or [],
+            sorted((server_config.env or {}).items()),
+            server_config.url,
+            sorted((server_config.headers or {}).items()),
+        ])
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+        return TOOLS_CACHE_DIR / f"{digest}.json"
+
+    async def _cache_server_tools(
+        self,
+        server_name: str,
+        session: ClientSession,
+        server_info: Optional[Implementation] = None
+    ):
+        """Cache server tool list, reusing the on-disk copy for an unchanged server version
+
+        A cache hit is revalidated with list_tools in the background, since
+        servers do not always bump their reported version when tools change.
+        """
+        cache_path = self._tools_cache_path(server_name, server_info)
+        if cache_path:
+            try:
+                tools = await asyncio.to_thread(_read_tools_cache, cache_path, server_info)
+                if tools is not None:
+                    self._set_server_tools(server_name, tools)
+                    logger.info(f"Server {server_name} provides {len(tools)} tools (cached)")
+                    task = asyncio.create_task(
+                        self._revalidate_server_tools(server_name, session, cache_path, server_info, tools)
+                    )
+                    self._revalidate_tasks.add(task)
+                    task.add_done_callback(self._revalidate_tasks.discard)
+                    return
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable tool cache for server {server_name}: {e}")
+
         try:
             tools_response = await session.list_tools()
             tools = tools_response.tools if tools_response else []
-            self._tools_cache[server_name] = tools
+            self._set_server_tools(server_name, tools)
             logger.info(f"Server {server_name} provides {len(tools)} tools")
 
         except Exception as e:
             logger.error(f"Failed to get tool list from server {server_name}: {e}")
-            self._tools_cache[server_name] = []
+            self._set_server_tools(server_name, [])
+            return
+
+        if cache_path:
+            try:
+                await asyncio.to_thread(_write_tools_cache, cache_path, server_info, tools)
+            except Exception as e:
+                logger.warning(f"Failed to write tool cache for server {server_name}: {e}")
     
-    async def get_all_tools(self) -> List[Dict[str, Any]]:
-        """Get all MCP tools"""
-        all_tools = []
+    async def _revalidate_server_tools(
+        self,
+        server_name: str,
+        session: ClientSession,
+        cache_path: Path,
+        server_info: Implementation,
+        cached_tools: List[MCPToolDefinition]
+    ):
+        """Refresh a cached tool list from the server, replacing it if the tools changed"""
+        try:
+            tools_response = await session.list_tools()
+            tools = tools_response.tools if tools_response else []
+            if _dump_tools(tools) == _dump_tools(cached_tools):
+                return
 
-        for server_name, tools in self._tools_cache.items():
-            for tool in tools:
-                # Generate tool name, avoiding duplicate mcp_ prefix
-                if server_name.startswith('mcp_'):
-                    tool_name = f"{server_name}_{tool.name}"
-                else:
-                    tool_name = f"mcp_{server_name}_{tool.name}"
-
-                # Convert to standard tool format
-                tool_schema = {
-                    "type": "function",
-                    "function": {
-                        "name": tool_name,
-                        "description": f"[{server_name}] {tool.description or tool.name}",
-                        "parameters": tool.inputSchema
-                    }
+            # Skip if the server was reconnected or disconnected meanwhile
+            managed = self._clients.get(server_name)
+            if managed is None or managed.session is not session:
+                return
+
+            self._set_server_tools(server_name, tools)
+            logger.info(f"Server {server_name} tools changed, now provides {len(tools)} tools")
+            await asyncio.to_thread(_write_tools_cache, cache_path, server_info, tools)
+
+        except Exception as e:
+            logger.warning(f"Failed to revalidate tool cache for server {server_name}: {e}")
+
+    def _cache_manifest_tools(self, server_name: str, server_config: MCPServerConfig):
+        """Cache tool list declared in the config of a lazy server"""
+        try:
+            tools = [MCPToolDefinition.model_validate(tool) for tool in server_config.tools]
+            self._set_server_tools(server_name, tools)
+            logger.info(f"Lazy server {server_name} declares {len(tools)} tools")
+
+        except Exception as e:
+            logger.error(f"Invalid tool manifest for lazy server {server_name}: {e}")
+            self._set_server_tools(server_name, [])
+
+    def _set_server_tools(self, server_name: str, tools: List[MCPToolDefinition]):
+        """Cache server tools as standard tool schemas and index their full names for dispatch"""
+        self._tool_index = {
+            tool_name: target for tool_name, target in self._tool_index.items()
+            if target[0] != server_name
+        }
+        prefix = self._server_prefixes[server_name]
+        ranks = {name: rank for rank, name in enumerate(self._server_prefixes)}
+        tool_schemas = []
+        for tool in tools:
+            tool_name = f"{prefix}_{tool.name}"
+
+            # Prefixed names can collide (server a_b tool c vs server a tool b_c);
+            # the server listed first in the config wins whatever the connect order
+            owner = self._tool_index.get(tool_name)
+            if owner and owner[0] != server_name:
+                if ranks[owner[0]] < ranks[server_name]:
+                    logger.warning(f"Skipping MCP tool {tool_name} of server {server_name}, already provided by server {owner[0]}")
+                    continue
+                logger.warning(f"MCP tool {tool_name} of server {server_name} replaces the one of server {owner[0]}")
+                self._tools_cache[owner[0]] = [
+                    schema for schema in self._tools_cache[owner[0]]
+                    if schema["function"]["name"] != tool_name
+                ]
+
+            self._tool_index[tool_name] = (server_name, tool.name)
+
+            # Convert to standard tool format
+            tool_schemas.append({
+                "type": "function",
+                "function": {
+                    "name": tool_name,
+                    "description": f"[{server_name}] {tool.description or tool.name}",
+                    "parameters": tool.inputSchema
                 }
-                all_tools.append(tool_schema)
+            })
+        self._tools_cache[server_name] = tool_schemas
+        self._all_tools_cache = None
+
+    async def get_all_tools(self) -> List[Dict[str, Any]]:
+        """Get all MCP tools"""
+        if self._all_tools_cache is not None:
+            return self._all_tools_cache
 
-        return all_tools
+        self._all_tools_cache = list(chain.from_iterable(self._tools_cache.values()))
+        return self._all_tools_cache
     
     async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> ToolResult:
         """Call MCP tool"""
         try:
-            # Parse tool name
-            server_name = None
-            original_tool_name = None
-
-            # Find matching server name
-            for srv_name in self._config.mcpServers.keys():
-                expected_prefix = srv_name if srv_name.startswith('mcp_') else f"mcp_{srv_name}"
-                if tool_name.startswith(f"{expected_prefix}_"):
-                    server_name = srv_name
-                    original_tool_name = tool_name[len(expected_prefix) + 1:]
-                    break
-
-            if not server_name or not original_tool_name:
+            # Resolve server and original tool name
+            try:
+                server_name, original_tool_name = self._tool_index[tool_name]
+            except KeyError:
                 raise ValueError(f"Unable to parse MCP tool name: {tool_name}")
 
             # Get client session
-            session = self._clients.get(server_name)
-            if not session:
+            managed = await self._ensure_connected(server_name)
+            if not managed:
                 return ToolResult(
                     success=False,
                     message=f"MCP server {server_name} is not connected"
                 )
 
-            # Call tool
-            result = await session.call_tool(original_tool_name, arguments)
+            # Call tool, retrying once on a fresh connection if the transport died
+            try:
+                result = await managed.session.call_tool(original_tool_name, arguments)
+            except TRANSPORT_ERRORS as e:
+                logger.warning(f"MCP server {server_name} connection lost: {e!r}")
+                managed = await self._reconnect(server_name, managed)
+                if not managed:
+                    return ToolResult(
+                        success=False,
+                        message=f"MCP server {server_name} is not connected"
+                    )
+                result = await managed.session.call_tool(original_tool_name, arguments)
+            managed.last_used = time.monotonic()
 
             # Process result
             if result:
-                content = []
-                if hasattr(result, 'content') and result.content:
-                    for item in result.content:
-                        if hasattr(item, 'text'):
-                            content.append(item.text)
-                        else:
-                            content.append(str(item))
+                items = getattr(result, 'content', None)
+                # Write content blocks straight into one buffer instead of list then join
+                buffer = io.StringIO()
+                for index, item in enumerate(items or ()):
+                    if index:
+                        buffer.write('\n')
+                    text = getattr(item, 'text', None)
+                    buffer.write(text if text is not None else str(item))
+                data = buffer.getvalue()
 
                 return ToolResult(
                     success=True,
-                    data='\n'.join(content) if content else "Tool executed successfully"
+                    data=data or "Tool executed successfully"
                 )
             else:
                 return ToolResult(
@@ -302,9 +677,27 @@ class MCPClientManager:
     async def cleanup(self):
         """Clean up resources"""
         try:
-            await self._exit_stack.aclose()
+            revalidate_tasks = list(self._revalidate_tasks)
+            for task in revalidate_tasks:
+                task.cancel()
+            await asyncio.gather(*revalidate_tasks, return_exceptions=True)
+
+            # Tear down servers concurrently, a failing server does not block its peers
+            server_names = list(self._server_tasks)
+            results = await asyncio.gather(
+                *(self._disconnect_server(server_name) for server_name in server_names),
+                return_exceptions=True
+            )
+            for server_name, result in zip(server_names, results):
+                if isinstance(result, BaseException):
+                    logger.error(f"Failed to disconnect MCP server {server_name}: {result}")
+
             self._clients.clear()
+            self._retry_after.clear()
+            self._connect_failures.clear()
             self._tools_cache.clear()
+            self._tool_index.clear()
+            self._all_tools_cache = None
             self._initialized = False
             logger.info("MCP client manager cleaned up")
 
@@ -320,33 +713,44 @@ class MCPTool(BaseTool):
     def __init__(self):
         super().__init__()
         self._initialized = False
+        self.manager: Optional[MCPClientManager] = None
         self._tools = []
+        self._function_names: frozenset = frozenset()
 
     async def initialized(self, config: Optional[MCPConfig] = None):
         """Ensure manager is initialized"""
         if not self._initialized:
             self.manager = MCPClientManager(config)
             await self.manager.initialize()
-            self._tools = await self.manager.get_all_tools()
+            await self._refresh_tools()
             self._initialized = True
 
+    async def _refresh_tools(self):
+        """Pick up manager tool list changes, e.g. a lazy server replacing its manifest on connect"""
+        tools = await self.manager.get_all_tools()
+        # The manager memoizes the list, so a new object means the tools changed
+        if tools is not self._tools:
+            self._tools = tools
+            self._function_names = frozenset(tool['function']['name'] for tool in tools)
+
     def get_tools(self) -> List[Dict[str, Any]]:
         """Get synchronous tool definitions (base tools)"""
         return self._tools
 
     def has_function(self, function_name: str) -> bool:
         """Check if specified function exists (including dynamic MCP tools)"""
-        # Check if it's an MCP tool
-        for tool in self._tools:
-            if tool['function']['name'] == function_name:
-                return True
-        return False
+        return function_name in self._function_names
 
     async def invoke_function(self, function_name: str, **kwargs) -> ToolResult:
         """Invoke tool function"""
-        return await self.manager.call_tool(function_name, kwargs)
+        result = await self.manager.call_tool(function_name, kwargs)
+        await self._refresh_tools()
+        return result
 
     async def cleanup(self):
         """Clean up resources"""
         if self.manager:
-            await self.manager.cleanup() 
+            await self.manager.cleanup()
+        self._tools = []
+        self._function_names = frozenset()
+        self._initialized = False 
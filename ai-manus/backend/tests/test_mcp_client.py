@@ -0,0 +1,378 @@
+"""
+Tests for MCP client connection lifecycle against local FastMCP stdio servers
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import pytest
+
+from app.domain.models.mcp_config import MCPConfig
+from app.domain.services.tools import mcp as mcp_module
+from app.domain.services.tools.mcp import MCPClientManager, MCPTool
+
+logger = logging.getLogger(__name__)
+
+
+# Usage: server.py serve <flag file> | server.py hang <pid file>
+SERVER_SCRIPT = '''
+import os
+import sys
+import json
+import time
+
+mode, path = sys.argv[1], sys.argv[2]
+if mode == "hang":
+    with open(path, "w") as f:
+        f.write(str(os.getpid()))
+    time.sleep(3600)
+
+from mcp.server.fastmcp import FastMCP, Image
+
+server = FastMCP("test")
+
+@server.tool()
+def echo(text: str) -> str:
+    """Echo text back"""
+    return text
+
+@server.tool()
+def pid() -> str:
+    """Return the server process id"""
+    return str(os.getpid())
+
+@server.tool()
+def mixed() -> list:
+    """Return text and image content blocks"""
+    return ["first", Image(data=b"image", format="png"), "last"]
+
+if os.path.exists(path):
+    @server.tool()
+    def added() -> str:
+        """Tool only present when the flag file exists"""
+        return "added"
+
+server.run()
+'''
+
+
+@pytest.fixture(autouse=True)
+def tools_cache_dir(tmp_path, monkeypatch):
+    """Keep the on-disk tool cache inside the test directory"""
+    cache_dir = tmp_path / "tools_cache"
+    monkeypatch.setattr(mcp_module, "TOOLS_CACHE_DIR", cache_dir)
+    return cache_dir
+
+
+@pytest.fixture
+def server_script(tmp_path):
+    """Write the FastMCP test server script"""
+    path = tmp_path / "server.py"
+    path.write_text(SERVER_SCRIPT)
+    return str(path)
+
+
+@pytest.fixture
+def flag_file(tmp_path):
+    """Path of the file that enables the extra test server tool"""
+    return tmp_path / "added.flag"
+
+
+def server_config(server_script, mode="serve", path="/nonexistent", **kwargs):
+    """Build a stdio server configuration for the test server"""
+    return {
+        "command": sys.executable,
+        "args": [server_script, mode, str(path)],
+        "transport": "stdio",
+        **kwargs
+    }
+
+
+def is_process_alive(pid: int) -> bool:
+    """Check whether a process still exists"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+async def call_pid(manager: MCPClientManager, tool_name: str) -> int:
+    """Get the process id of the server providing a tool"""
+    result = await manager.call_tool(tool_name, {})
+    assert result.success is True, result.message
+    return int(result.data)
+
+
+async def test_concurrent_connect_with_hanging_server(server_script, tmp_path, caplog):
+    """Test a hanging server times out and is reaped while its peer connects"""
+    pid_file = tmp_path / "hang.pid"
+    manager = MCPClientManager(MCPConfig(mcpServers={
+        "echo": server_config(server_script),
+        "hang": server_config(server_script, mode="hang", path=pid_file, timeout=1),
+    }))
+
+    try:
+        await manager.initialize()
+
+        result = await manager.call_tool("mcp_echo_echo", {"text": "hello"})
+        assert result.success is True
+        assert result.data == "hello"
+
+        result = await manager.call_tool("mcp_hang_echo", {"text": "hello"})
+        assert result.success is False
+
+        hang_pid = int(pid_file.read_text())
+        assert not is_process_alive(hang_pid)
+        assert "Timed out connecting to MCP server hang after 1.0s" in caplog.text
+    finally:
+        await manager.cleanup()
+
+
+async def test_cleanup_from_different_task(server_script, caplog):
+    """Test cleanup closes connections opened by other tasks"""
+    manager = MCPClientManager(MCPConfig(mcpServers={
+        "first": server_config(server_script),
+        "second": server_config(server_script),
+    }))
+    await asyncio.create_task(manager.initialize())
+    pids = [
+        await call_pid(manager, "mcp_first_pid"),
+        await call_pid(manager, "mcp_second_pid"),
+    ]
+
+    with caplog.at_level(logging.ERROR):
+        await asyncio.create_task(manager.cleanup())
+
+    assert not [record for record in caplog.records if record.levelno >= logging.ERROR]
+    assert not any(is_process_alive(pid) for pid in pids)
+
+
+async def test_lazy_connect_from_manifest(server_script):
+    """Test a lazy server advertises its manifest and connects on first call"""
+    config = MCPConfig(mcpServers={
+        "lazy": server_config(server_script, lazy=True, tools=[{
+            "name": "echo",
+            "description": "Echo text back",
+            "inputSchema": {"type": "object", "properties": {"text": {"type": "string"}}},
+        }]),
+    })
+    tool = MCPTool()
+
+    try:
+        await tool.initialized(config)
+        assert tool.has_function("mcp_lazy_echo")
+        assert not tool.has_function("mcp_lazy_pid")
+        assert "lazy" not in tool.manager._clients
+
+        result = await tool.invoke_function("mcp_lazy_echo", text="hello")
+        assert result.success is True
+        assert result.data == "hello"
+
+        # The real tool list replaces the manifest once connected
+        assert tool.has_function("mcp_lazy_pid")
+    finally:
+        await tool.cleanup()
+
+
+@pytest.mark.parametrize("server_names", [["a", "a_b"], ["a_b", "a"]])
+async def test_tool_name_collision_keeps_first_server(server_script, server_names):
+    """Test a prefixed tool name provided by two servers resolves to the first configured one"""
+    servers = {
+        # mcp_a + b_echo and mcp_a_b + echo both become mcp_a_b_echo
+        "a": server_config(server_script, lazy=True, tools=[{
+            "name": "b_echo",
+            "inputSchema": {"type": "object"},
+        }]),
+        "a_b": server_config(server_script),
+    }
+    manager = MCPClientManager(MCPConfig(mcpServers={name: servers[name] for name in server_names}))
+
+    try:
+        await manager.initialize()
+        tool_names = [tool["function"]["name"] for tool in await manager.get_all_tools()]
+
+        assert tool_names.count("mcp_a_b_echo") == 1
+        assert manager._tool_index["mcp_a_b_echo"][0] == server_names[0]
+    finally:
+        await manager.cleanup()
+
+async def test_call_tool_joins_content(server_script):
+    """Test text blocks are kept as is and other blocks are stringified, one per line"""
+    manager = MCPClientManager(MCPConfig(mcpServers={"echo": server_config(server_script)}))
+
+    try:
+        await manager.initialize()
+        result = await manager.call_tool("mcp_echo_mixed", {})
+
+        assert result.success is True
+        first, image, last = result.data.split("\n")
+        assert first == "first"
+        assert image.startswith("type='image'")
+        assert "mimeType='image/png'" in image
+        assert last == "last"
+    finally:
+        await manager.cleanup()
+
+
+async def test_reconnect_after_server_exit(server_script, monkeypatch):
+    """Test a call after the server process died transparently reconnects"""
+    monkeypatch.setattr(mcp_module, "KEEPALIVE_INTERVAL", 0)
+    monkeypatch.setattr(mcp_module, "PING_TIMEOUT", 0.1)
+    manager = MCPClientManager(MCPConfig(mcpServers={"echo": server_config(server_script)}))
+
+    try:
+        await manager.initialize()
+        pid = await call_pid(manager, "mcp_echo_pid")
+        os.kill(pid, 9)
+
+        new_pid = await call_pid(manager, "mcp_echo_pid")
+        assert new_pid != pid
+    finally:
+        await manager.cleanup()
+
+
+async def test_retry_after_failed_reconnect(server_script, monkeypatch):
+    """Test a server whose reconnect failed is retried once its cooldown passed"""
+    monkeypatch.setattr(mcp_module, "KEEPALIVE_INTERVAL", 0)
+    monkeypatch.setattr(mcp_module, "PING_TIMEOUT", 0.1)
+    manager = MCPClientManager(MCPConfig(mcpServers={"echo": server_config(server_script)}))
+
+    try:
+        await manager.initialize()
+        server = manager._config.mcpServers["echo"]
+        pid = await call_pid(manager, "mcp_echo_pid")
+
+        # Kill the server while relaunching it is impossible
+        os.kill(pid, 9)
+        command = server.command
+        server.command = "/nonexistent"
+        result = await manager.call_tool("mcp_echo_pid", {})
+        assert result.success is False
+
+        # Still cooling down, so no relaunch is attempted yet
+        server.command = command
+        result = await manager.call_tool("mcp_echo_pid", {})
+        assert result.message == "MCP server echo is not connected"
+
+        manager._retry_after.clear()
+        new_pid = await call_pid(manager, "mcp_echo_pid")
+        assert new_pid != pid
+    finally:
+        await manager.cleanup()
+
+
+def test_resolve_command_follows_moved_binary(tmp_path):
+    """Test a cached command path is resolved again once the binary moved away"""
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+    binary = first / "mcp-test-server"
+    binary.write_text("#!/bin/sh\n")
+    binary.chmod(0o755)
+    path = os.pathsep.join([str(first), str(second)])
+
+    assert mcp_module._resolve_command("mcp-test-server", path) == str(binary)
+
+    binary.rename(second / "mcp-test-server")
+    assert mcp_module._resolve_command("mcp-test-server", path) == str(second / "mcp-test-server")
+
+    (second / "mcp-test-server").unlink()
+    assert mcp_module._resolve_command("mcp-test-server", path) == "mcp-test-server"
+
+
+async def test_tools_cached_on_disk(server_script, tools_cache_dir, caplog):
+    """Test a second connect serves the tool list from the disk cache"""
+    config = MCPConfig(mcpServers={"echo": server_config(server_script)})
+
+    manager = MCPClientManager(config)
+    await manager.initialize()
+    await manager.cleanup()
+    assert list(tools_cache_dir.glob("*.json"))
+
+    manager = MCPClientManager(config)
+    try:
+        with caplog.at_level(logging.INFO):
+            await manager.initialize()
+        assert "(cached)" in caplog.text
+        revalidate_tasks = set(manager._revalidate_tasks)
+
+        result = await manager.call_tool("mcp_echo_echo", {"text": "cached"})
+        assert result.success is True
+        assert result.data == "cached"
+    finally:
+        await manager.cleanup()
+
+    # Cleanup waits for background revalidation rather than leaving it running
+    assert all(task.done() for task in revalidate_tasks)
+
+
+async def test_tools_cache_replaced_on_version_change(server_script, tools_cache_dir, caplog):
+    """Test a new server version misses the cache and overwrites the old version's file"""
+    config = MCPConfig(mcpServers={"echo": server_config(server_script)})
+
+    manager = MCPClientManager(config)
+    await manager.initialize()
+    await manager.cleanup()
+
+    # Pretend the cache was written by an older server version
+    cache_file, = tools_cache_dir.glob("*.json")
+    cache = json.loads(cache_file.read_text())
+    version = cache["server"][1]
+    cache["server"][1] = "0.0.0"
+    cache_file.write_text(json.dumps(cache))
+
+    manager = MCPClientManager(config)
+    try:
+        with caplog.at_level(logging.INFO):
+            await manager.initialize()
+        assert "(cached)" not in caplog.text
+    finally:
+        await manager.cleanup()
+
+    assert list(tools_cache_dir.glob("*.json")) == [cache_file]
+    assert json.loads(cache_file.read_text())["server"][1] == version
+
+
+def test_tools_cache_write_failure_leaves_no_temp_file(tools_cache_dir, monkeypatch):
+    """Test a failed cache write removes its temporary file"""
+    def fail_replace(src, dst):
+        raise OSError("replace failed")
+
+    monkeypatch.setattr(mcp_module.os, "replace", fail_replace)
+    server_info = mcp_module.Implementation(name="test", version="1.0")
+    tools = [mcp_module.MCPToolDefinition(name="echo", inputSchema={"type": "object"})]
+
+    with pytest.raises(OSError):
+        mcp_module._write_tools_cache(tools_cache_dir / "tools.json", server_info, tools)
+    assert not list(tools_cache_dir.glob("*.tmp"))
+
+
+async def test_cached_tools_revalidated(server_script, flag_file, tools_cache_dir):
+    """Test a tool list served from the disk cache picks up server changes"""
+    config = MCPConfig(mcpServers={"echo": server_config(server_script, path=flag_file)})
+
+    manager = MCPClientManager(config)
+    await manager.initialize()
+    await manager.cleanup()
+    assert list(tools_cache_dir.glob("*.json"))
+
+    # Same command, args and reported version, but one more tool
+    flag_file.touch()
+    tool = MCPTool()
+    try:
+        await tool.initialized(config)
+
+        deadline = time.monotonic() + 10
+        while not tool.has_function("mcp_echo_added") and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+            await tool._refresh_tools()
+
+        result = await tool.invoke_function("mcp_echo_added")
+        assert result.success is True
+        assert result.data == "added"
+    finally:
+        await tool.cleanup()
+    assert not list(tools_cache_dir.glob("*.tmp"))